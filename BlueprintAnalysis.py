@@ -1,12 +1,101 @@
 import pandas as pd
+from pandas.api.types import is_datetime64_any_dtype, is_list_like
 import numpy as np
 from sklearn.ensemble import IsolationForest
+import joblib
+
+import os
+import tempfile
+from collections.abc import ItemsView, Mapping, ValuesView
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+
+# Smallest row block worth scoring on its own thread
+_MIN_ROWS_PER_SHARD = 1000
+
+# Annual inventory carrying cost as a fraction of unit cost
+_CARRYING_COST_RATE = 0.2
+
+
+@lru_cache(maxsize=32)
+def _trend_projection(n_periods):
+    """Pseudo-inverse of the [x, 1] design matrix for a linear trend over n_periods"""
+    x = np.arange(n_periods, dtype=np.float64)
+    projection = np.linalg.pinv(np.stack([x, np.ones_like(x)], axis=1))
+    projection.setflags(write=False)
+
+    return projection
+
+
+@dataclass
+class _OrderSoA:
+    """Column-oriented view of one order batch, built once and shared by each step"""
+    index: pd.Index
+    ts_hour: np.ndarray
+    ts_dow: np.ndarray
+    total_amt: np.ndarray
+    hist_count: np.ndarray
+    hist_mean: np.ndarray
+    # Products of order i are products[prod_codes[prod_offsets[i]:prod_offsets[i + 1]]]
+    prod_codes: np.ndarray
+    prod_offsets: np.ndarray
+    products: np.ndarray
+
+
+class _DemandDistribution(Mapping):
+    """Read-only product -> order count mapping over the product and count arrays"""
+
+    def __init__(self, products, counts):
+        self._products = products
+        self._counts = counts
+        self._lookup = None
+
+    def __getitem__(self, product):
+        # Only callers that look products up pay for building the index
+        if self._lookup is None:
+            self._lookup = dict(zip(self._products, self._counts.tolist()))
+        return self._lookup[product]
+
+    def __iter__(self):
+        return iter(self._products)
+
+    def __len__(self):
+        return len(self._products)
+
+    def items(self):
+        return _DemandItems(self)
+
+    def values(self):
+        return _DemandValues(self)
+
+
+class _DemandItems(ItemsView):
+    def __iter__(self):
+        return zip(self._mapping._products, self._mapping._counts.tolist())
+
+
+class _DemandValues(ValuesView):
+    def __iter__(self):
+        return iter(self._mapping._counts.tolist())
 
 
 class BlueprintOrderAnalysis:
-    def __init__(self):
-        self.fraud_detector = IsolationForest(contamination=0.01)
+    def __init__(self, model_path=None):
+        # Trees are built on a thread per core; sklearn releases the GIL there
+        self.fraud_detector = IsolationForest(contamination=0.01, n_jobs=-1)
+        self._trained = False
+
+        # Reuse a forest saved by train_fraud_detector, possibly in another
+        # process, instead of retraining it
+        model_path = model_path or os.environ.get('FRAUD_MODEL_PATH')
+        self._model_path = Path(model_path) if model_path else None
+        if self._model_path is not None and self._model_path.exists():
+            self.fraud_detector = joblib.load(self._model_path, mmap_mode='r')
+            self._trained = True
 
     def process_orders(self, orders_df):
         """
@@ -19,6 +108,9 @@ class BlueprintOrderAnalysis:
             - products
             - total_amount
             - timestamp
+
+        Every order is scored, including orders with a null customer_id;
+        those are treated as the customer's only order.
         """
         # Enrich order data
         enriched_orders = self._enrich_order_data(orders_df)
@@ -34,26 +126,42 @@ class BlueprintOrderAnalysis:
             'inventory_impact': inventory_impact
         }
 
+    def train_fraud_detector(self, history_df):
+        """
+        Fit the fraud detector on historical orders
+
+        Parameters:
+        history_df (pd.DataFrame): Past orders with the same columns
+            accepted by process_orders
+        """
+        features = self._extract_fraud_features(self._enrich_order_data(history_df))
+        self._fit_fraud_detector(features)
+
+        if self._model_path is not None:
+            self._save_fraud_detector()
+
     def forecast_demand(self, historical_orders, forecast_periods=30):
         """
         Forecast demand for each product category
         """
-        # Group by date and product category
+        # Group by date and product category, one column per category
         daily_demand = historical_orders.groupby(
-            ['date', 'product_category'])['quantity'].sum().reset_index()
+            ['date', 'product_category'])['quantity'].sum().unstack(fill_value=0)
 
-        forecasts = {}
-        for category in daily_demand['product_category'].unique():
-            category_demand = daily_demand[
-                daily_demand['product_category'] == category
-                ].set_index('date')['quantity']
+        # Calculate every category's trend with one product against the
+        # cached least-squares projection for this many days
+        trend = _trend_projection(len(daily_demand)) @ daily_demand.to_numpy(dtype=np.float64)
 
-            # Calculate trend
-            trend = np.polyfit(range(len(category_demand)), category_demand, 1)
-            forecast = np.poly1d(trend)(range(len(category_demand),
-                                              len(category_demand) + forecast_periods))
+        # Extrapolate slope * x + intercept for all categories in one broadcast
+        slope, intercept = trend
+        future_x = np.arange(len(daily_demand), len(daily_demand) + forecast_periods,
+                             dtype=np.float64)
+        forecast = future_x[:, np.newaxis] * slope + intercept
 
-            forecasts[category] = forecast.tolist()
+        forecasts = {
+            category: values.tolist()
+            for category, values in zip(daily_demand.columns, forecast.T)
+        }
 
         return forecasts
 
@@ -71,54 +179,154 @@ class BlueprintOrderAnalysis:
         return metrics
 
     def _enrich_order_data(self, orders_df):
-        """Add derived features for analysis"""
-        enriched = orders_df.copy()
-
+        """Add derived features for analysis as one contiguous array per column"""
         # Add time-based features
-        enriched['hour'] = pd.to_datetime(enriched['timestamp']).dt.hour
-        enriched['day_of_week'] = pd.to_datetime(enriched['timestamp']).dt.dayofweek
-
-        # Add customer history features
-        customer_history = orders_df.groupby('customer_id').agg({
+        timestamps = orders_df['timestamp']
+        if not is_datetime64_any_dtype(timestamps):
+            timestamps = pd.to_datetime(timestamps, cache=True)
+        hour = timestamps.dt.hour
+        day_of_week = timestamps.dt.dayofweek
+
+        # Both fit in int8; a batch with NaT timestamps keeps NaN for those
+        # rows instead of casting them to a real hour and day
+        if not timestamps.hasnans:
+            hour = hour.astype(np.int8)
+            day_of_week = day_of_week.astype(np.int8)
+
+        # Add customer history features, grouping on integer customer codes
+        # rather than hashing the raw ids
+        cust_code, _ = pd.factorize(orders_df['customer_id'], sort=False)
+        cust_code = cust_code.astype(np.int32, copy=False)
+        customer_history = orders_df.groupby(cust_code).agg({
             'order_id': 'count',
             'total_amount': 'mean'
-        }).reset_index()
-
-        enriched = enriched.merge(customer_history,
-                                  on='customer_id',
-                                  suffixes=('', '_history'))
-
-        return enriched
-
-    def _detect_fraud(self, orders_df):
+        }).drop(index=-1, errors='ignore')
+
+        # Known customers' codes run 0..K-1, so each order's history is a
+        # positional take from the per-customer aggregate. Orders without a
+        # customer id have no history to draw on, so each one is treated as
+        # its customer's only order rather than pooled with other guests
+        known = cust_code >= 0
+        hist_count = np.ones(len(cust_code), dtype=np.int64)
+        hist_count[known] = customer_history['order_id'].to_numpy()[cust_code[known]]
+        hist_mean = orders_df['total_amount'].to_numpy(dtype=np.float64, copy=True)
+        hist_mean[known] = customer_history['total_amount'].to_numpy()[cust_code[known]]
+
+        # Dictionary-encode the product lists into flat int32 codes plus per-order
+        # offsets; product names are only looked up again for the final report.
+        # As with explode, a missing product list counts as no products
+        # and a bare scalar as a single product
+        product_lists = [
+            products if is_list_like(products)
+            else () if pd.isna(products)
+            else (products,)
+            for products in orders_df['products']
+        ]
+        prod_offsets = np.zeros(len(product_lists) + 1, dtype=np.int64)
+        np.cumsum([len(products) for products in product_lists], out=prod_offsets[1:])
+        product_lines = np.fromiter(chain.from_iterable(product_lists), dtype=object,
+                                    count=prod_offsets[-1])
+        prod_codes, products = pd.factorize(product_lines, sort=True)
+        prod_codes = prod_codes.astype(np.int32, copy=False)
+
+        return _OrderSoA(
+            index=orders_df.index,
+            ts_hour=hour.to_numpy(),
+            ts_dow=day_of_week.to_numpy(),
+            total_amt=orders_df['total_amount'].to_numpy(),
+            hist_count=hist_count,
+            hist_mean=hist_mean,
+            prod_codes=prod_codes,
+            prod_offsets=prod_offsets,
+            products=products
+        )
+
+    def _detect_fraud(self, orders):
         """Detect potentially fraudulent orders"""
-        # Extract relevant features for fraud detection
-        features = orders_df[[
-            'total_amount',
-            'hour',
-            'day_of_week',
-            'order_id_history',
-            'total_amount_history'
-        ]]
+        features = self._extract_fraud_features(orders)
 
-        # Fit and predict
-        predictions = self.fraud_detector.fit_predict(features)
+        # Fit on the first batch if no history was provided, then only score
+        if not self._trained:
+            self._fit_fraud_detector(features)
+        predictions = self._predict_fraud(features)
 
         # Return fraud scores
-        return pd.Series(predictions, index=orders_df.index)
-
-    def _analyze_inventory_impact(self, orders_df):
+        return pd.Series(predictions, index=orders.index)
+
+    def _predict_fraud(self, features):
+        """Score orders, sharding large batches across threads"""
+        # Tree traversal releases the GIL, so threads scale over row blocks
+        # without pickling the forest; small batches are not worth splitting
+        n_shards = min(os.cpu_count() or 1, len(features) // _MIN_ROWS_PER_SHARD)
+        if n_shards <= 1:
+            return self.fraud_detector.predict(features)
+
+        blocks = np.array_split(features, n_shards)
+        with ThreadPoolExecutor(max_workers=n_shards) as executor:
+            predictions = list(executor.map(self.fraud_detector.predict, blocks))
+
+        return np.concatenate(predictions)
+
+    def _fit_fraud_detector(self, features):
+        """Fit the fraud detector on a feature matrix"""
+        self.fraud_detector.fit(features)
+        self._trained = True
+
+    def _save_fraud_detector(self):
+        """Save the fraud detector to the model path"""
+        # Write a temp file next to the target and swap it in, so processes
+        # reading the old file never see a truncated or half-written one
+        fd, tmp_path = tempfile.mkstemp(dir=self._model_path.parent,
+                                        prefix=self._model_path.name, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump(self.fraud_detector, tmp_path, compress=0)
+            os.replace(tmp_path, self._model_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    def _extract_fraud_features(self, orders):
+        """Build the fraud detection feature matrix from enriched orders"""
+        # Extract relevant features for fraud detection
+        feature_columns = [
+            orders.total_amt,
+            orders.ts_hour,
+            orders.ts_dow,
+            orders.hist_count,
+            orders.hist_mean
+        ]
+
+        # Pack them into a contiguous float32 matrix, the dtype the forest
+        # works in, so sklearn does not convert them again
+        features = np.empty((len(orders.index), len(feature_columns)),
+                            dtype=np.float32, order='C')
+        for i, column in enumerate(feature_columns):
+            features[:, i] = column
+
+        return features
+
+    def _analyze_inventory_impact(self, orders):
         """Analyze how orders affect inventory levels"""
-        # Group by product and calculate demand
-        product_demand = orders_df.explode('products').groupby('products').agg({
-            'order_id': 'count'
-        }).reset_index()
+        # Count the product codes directly, with no exploded frame or hash groupby
+        codes = orders.prod_codes
+        product_demand = np.bincount(codes[codes >= 0], minlength=len(orders.products))
+
+        # Select the five highest counts in linear time and sort only those,
+        # highest demand first with ties broken in product order
+        n_top = min(5, len(product_demand))
+        top_products = np.empty(0, dtype=np.intp)
+        if n_top:
+            threshold = np.partition(product_demand, -n_top)[-n_top]
+            candidates = np.flatnonzero(product_demand >= threshold)
+            top_products = candidates[
+                np.argsort(-product_demand[candidates], kind='stable')[:n_top]]
 
         # Calculate inventory metrics
         inventory_metrics = {
-            'high_demand_products': product_demand.nlargest(5, 'order_id')['products'].tolist(),
-            'total_product_demand': product_demand['order_id'].sum(),
-            'demand_distribution': product_demand.set_index('products')['order_id'].to_dict()
+            'high_demand_products': orders.products[top_products].tolist(),
+            'total_product_demand': product_demand.sum(),
+            'demand_distribution': _DemandDistribution(orders.products, product_demand)
         }
 
         return inventory_metrics
@@ -133,50 +341,76 @@ class InventoryOptimization:
         """
         Calculate reorder points for each product
         """
-        reorder_points = {}
+        demand_stats = self._calculate_demand_stats(inventory_data, sales_history)
 
-        for product in inventory_data.index:
-            # Calculate average daily demand
-            daily_demand = sales_history[sales_history['product'] == product]['quantity'].mean()
+        return self._reorder_points_from_stats(inventory_data, demand_stats)
 
-            # Calculate safety stock
-            demand_std = sales_history[sales_history['product'] == product]['quantity'].std()
-            safety_stock = demand_std * self.safety_stock_factor * np.sqrt(self.lead_time_days)
+    def optimize_order_quantities(self, inventory_data, sales_history,
+                                  carrying_cost_rate=_CARRYING_COST_RATE):
+        """
+        Calculate optimal order quantities using Economic Order Quantity (EOQ) formula
+        """
+        demand_stats = self._calculate_demand_stats(inventory_data, sales_history)
 
-            # Calculate reorder point
-            reorder_point = (daily_demand * self.lead_time_days) + safety_stock
+        return self._order_quantities_from_stats(
+            inventory_data, demand_stats, len(sales_history), carrying_cost_rate
+        )
 
-            reorder_points[product] = {
-                'reorder_point': reorder_point,
-                'safety_stock': safety_stock,
-                'avg_daily_demand': daily_demand
+    def _calculate_demand_stats(self, inventory_data, sales_history):
+        """Aggregate per-product demand statistics in a single pass"""
+        demand_stats = sales_history.groupby('product')['quantity'].agg(
+            ['mean', 'std', 'sum']).reindex(inventory_data.index)
+        demand_stats['sum'] = demand_stats['sum'].fillna(0)
+
+        return demand_stats
+
+    def _reorder_points_from_stats(self, inventory_data, demand_stats):
+        """Calculate reorder points from aggregated demand statistics"""
+        # Calculate average daily demand
+        daily_demand = demand_stats['mean'].to_numpy()
+
+        # Calculate safety stock
+        demand_std = demand_stats['std'].to_numpy()
+        safety_stock = demand_std * (self.safety_stock_factor * np.sqrt(self.lead_time_days))
+
+        # Calculate reorder point
+        reorder_point = (daily_demand * self.lead_time_days) + safety_stock
+
+        reorder_points = {
+            product: {
+                'reorder_point': rop,
+                'safety_stock': ss,
+                'avg_daily_demand': demand
             }
+            for product, rop, ss, demand in zip(
+                inventory_data.index, reorder_point, safety_stock, daily_demand)
+        }
 
         return reorder_points
 
-    def optimize_order_quantities(self, inventory_data, sales_history, carrying_cost_rate=0.2):
-        """
-        Calculate optimal order quantities using Economic Order Quantity (EOQ) formula
-        """
-        order_quantities = {}
-
-        for product in inventory_data.index:
-            # Get product specific data
-            annual_demand = sales_history[sales_history['product'] == product]['quantity'].sum() * (
-                        365 / len(sales_history))
-            ordering_cost = inventory_data.loc[product, 'ordering_cost']
-            unit_cost = inventory_data.loc[product, 'unit_cost']
-
-            # Calculate EOQ (Economic Order Quantity)
-            eoq = np.sqrt((2 * annual_demand * ordering_cost) / (unit_cost * carrying_cost_rate))
-
-            order_quantities[product] = {
-                'eoq': eoq,
-                'annual_demand': annual_demand,
-                'total_annual_cost': self._calculate_total_cost(
-                    annual_demand, eoq, ordering_cost, unit_cost, carrying_cost_rate
-                )
+    def _order_quantities_from_stats(self, inventory_data, demand_stats, sales_count,
+                                     carrying_cost_rate):
+        """Calculate EOQ figures from aggregated demand statistics"""
+        # Get product specific data
+        annual_demand = demand_stats['sum'].to_numpy() * (365 / sales_count)
+        ordering_cost = inventory_data['ordering_cost'].to_numpy()
+        unit_cost = inventory_data['unit_cost'].to_numpy()
+
+        # Calculate EOQ (Economic Order Quantity)
+        eoq = np.sqrt((2 * annual_demand * ordering_cost) / (unit_cost * carrying_cost_rate))
+        total_annual_cost = self._calculate_total_cost(
+            annual_demand, eoq, ordering_cost, unit_cost, carrying_cost_rate
+        )
+
+        order_quantities = {
+            product: {
+                'eoq': quantity,
+                'annual_demand': demand,
+                'total_annual_cost': cost
             }
+            for product, quantity, demand, cost in zip(
+                inventory_data.index, eoq, annual_demand, total_annual_cost)
+        }
 
         return order_quantities
 
@@ -197,12 +431,17 @@ class InventoryOptimization:
 
         return annual_ordering_cost + annual_carrying_cost
 
-    def generate_inventory_report(self, inventory_data, sales_history):
+    def generate_inventory_report(self, inventory_data, sales_history,
+                                  carrying_cost_rate=_CARRYING_COST_RATE):
         """
         Generate comprehensive inventory optimization report
         """
-        reorder_points = self.calculate_reorder_points(inventory_data, sales_history)
-        optimal_quantities = self.optimize_order_quantities(inventory_data, sales_history)
+        # Share one aggregation of the sales history between both calculations
+        demand_stats = self._calculate_demand_stats(inventory_data, sales_history)
+        reorder_points = self._reorder_points_from_stats(inventory_data, demand_stats)
+        optimal_quantities = self._order_quantities_from_stats(
+            inventory_data, demand_stats, len(sales_history), carrying_cost_rate
+        )
 
         report = {
             'inventory_optimization': {
@@ -234,25 +473,37 @@ class InventoryOptimization:
 
     def _generate_recommendations(self, inventory_data, reorder_points, optimal_quantities):
         """Generate actionable inventory recommendations"""
-        recommendations = []
+        products = inventory_data.index
+        current_stock = inventory_data['quantity_on_hand'].to_numpy()
+        max_stock = inventory_data['max_stock_level'].to_numpy()
+        reorder_point = np.fromiter(
+            (reorder_points[product]['reorder_point'] for product in products),
+            dtype=np.float64, count=len(products))
+        optimal_qty = np.fromiter(
+            (optimal_quantities[product]['eoq'] for product in products),
+            dtype=np.float64, count=len(products))
+
+        # Flag every product at once instead of looking each one up
+        reorder_mask = current_stock <= reorder_point
+        reduce_mask = ~reorder_mask & (current_stock > max_stock)
+        urgency = np.where(current_stock == 0, 'HIGH', 'MEDIUM').tolist()
+        excess_stock = current_stock - max_stock
 
-        for product in inventory_data.index:
-            current_stock = inventory_data.loc[product, 'quantity_on_hand']
-            reorder_point = reorder_points[product]['reorder_point']
-            optimal_qty = optimal_quantities[product]['eoq']
+        recommendations = []
 
-            if current_stock <= reorder_point:
+        for i in np.flatnonzero(reorder_mask | reduce_mask):
+            if reorder_mask[i]:
                 recommendations.append({
-                    'product': product,
+                    'product': products[i],
                     'action': 'REORDER',
-                    'quantity': optimal_qty,
-                    'urgency': 'HIGH' if current_stock == 0 else 'MEDIUM'
+                    'quantity': optimal_qty[i],
+                    'urgency': urgency[i]
                 })
-            elif current_stock > inventory_data.loc[product, 'max_stock_level']:
+            else:
                 recommendations.append({
-                    'product': product,
+                    'product': products[i],
                     'action': 'REDUCE',
-                    'quantity': current_stock - inventory_data.loc[product, 'max_stock_level'],
+                    'quantity': excess_stock[i],
                     'urgency': 'LOW'
                 })
 
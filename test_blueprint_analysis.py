@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+
+from BlueprintAnalysis import BlueprintOrderAnalysis
+
+
+def _orders(products):
+    return pd.DataFrame({
+        'order_id': range(len(products)),
+        'customer_id': ['a', 'b', 'a', 'c'][:len(products)],
+        'products': products,
+        'total_amount': [10.0, 25.0, 12.5, 40.0][:len(products)],
+        'timestamp': pd.date_range('2024-01-01', periods=len(products), freq='h')
+    })
+
+
+def test_null_product_list_counts_as_no_products():
+    orders = _orders([['x', 'y'], None, ['x'], np.nan])
+
+    impact = BlueprintOrderAnalysis().process_orders(orders)['inventory_impact']
+
+    assert dict(impact['demand_distribution']) == {'x': 2, 'y': 1}
+    assert impact['total_product_demand'] == 3
+    assert impact['high_demand_products'] == ['x', 'y']
+
+
+def test_missing_timestamp_keeps_nan_time_features():
+    orders = _orders([['x'], ['y'], ['x'], ['z']])
+    orders.loc[1, 'timestamp'] = pd.NaT
+
+    enriched = BlueprintOrderAnalysis()._enrich_order_data(orders)
+
+    assert np.isnan(enriched.ts_hour[1]) and np.isnan(enriched.ts_dow[1])
+    assert enriched.ts_hour[2] == 2
+
+
+def test_only_trained_detector_is_saved(tmp_path):
+    model_path = tmp_path / 'fraud.joblib'
+    orders = _orders([['x'], ['y'], ['x'], ['z']])
+
+    BlueprintOrderAnalysis(model_path=model_path).process_orders(orders)
+    assert not model_path.exists()
+
+    BlueprintOrderAnalysis(model_path=model_path).train_fraud_detector(orders)
+    assert [p.name for p in tmp_path.iterdir()] == ['fraud.joblib']
+
+    reloaded = BlueprintOrderAnalysis(model_path=model_path)
+    assert reloaded._trained
+    reloaded.process_orders(orders)
+
+
+def test_demand_distribution_handles_mixed_product_keys():
+    orders = _orders([['x', 1], ['x'], [2]])
+
+    impact = BlueprintOrderAnalysis().process_orders(orders)['inventory_impact']
+    distribution = impact['demand_distribution']
+
+    assert dict(distribution) == {1: 1, 2: 1, 'x': 2}
+    assert dict(distribution.items()) == {1: 1, 2: 1, 'x': 2}
+    assert distribution['x'] == 2 and 3 not in distribution
+
+
+def test_orders_without_customer_are_their_own_history():
+    orders = _orders([['x'], ['y'], ['x'], ['z']])
+    orders['customer_id'] = ['a', None, 'a', None]
+
+    enriched = BlueprintOrderAnalysis()._enrich_order_data(orders)
+
+    assert enriched.hist_count.tolist() == [2, 1, 2, 1]
+    assert enriched.hist_mean.tolist() == [11.25, 25.0, 11.25, 40.0]